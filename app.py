@@ -1,15 +1,111 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, redirect, url_for
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+import orjson
 import os
+import io
+import re
+import string
+import asyncio
+import functools
+import threading
+import hashlib
+import hmac
+import json
+from flask_caching import Cache
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 import openai
-from docx import Document
-from docx.shared import Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
+from openai import AsyncAzureOpenAI
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 import tempfile
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from policy_document import build_docx_bytes
+
+class OrjsonProvider(JSONProvider):
+    """Serve jsonify and dict responses through orjson"""
+    # Types orjson can't encode natively (Decimal, __html__, dates as HTTP dates)
+    # are handed to Flask's default serializer, so responses match Flask's
+    default = staticmethod(DefaultJSONProvider.default)
+    sort_keys = DefaultJSONProvider.sort_keys
+    
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Cache generated policies so identical requests skip the LLM call.
+# Redis is shared across instances; fall back to a local filesystem cache.
+cache_config = {'CACHE_DEFAULT_TIMEOUT': 6 * 60 * 60}
+if os.getenv('REDIS_URL'):
+    cache_config.update({'CACHE_TYPE': 'RedisCache', 'CACHE_REDIS_URL': os.getenv('REDIS_URL')})
+else:
+    cache_config.update({'CACHE_TYPE': 'FileSystemCache', 'CACHE_DIR': os.path.join(tempfile.gettempdir(), 'policy_cache')})
+cache = Cache(app, config=cache_config)
+
+# python-docx/lxml memory is not returned to the OS after a document is built,
+# so documents are built in child processes that are recycled periodically
+DOCX_BUILD_TIMEOUT = 60
+
+def new_docx_pool():
+    return ProcessPoolExecutor(max_workers=2, max_tasks_per_child=20)
+
+DOCX_POOL = new_docx_pool()
+docx_pool_lock = threading.Lock()
+
+def build_docx_in_pool(form_data, policy_lines):
+    """Build the Word document in DOCX_POOL, replacing the pool once if a child died"""
+    global DOCX_POOL
+    pool = DOCX_POOL
+    try:
+        return pool.submit(build_docx_bytes, form_data, policy_lines).result(timeout=DOCX_BUILD_TIMEOUT)
+    except BrokenProcessPool:
+        # A killed child (e.g. OOM) breaks the whole pool; only the first
+        # thread to notice replaces it
+        app.logger.warning("Document worker process died; restarting DOCX_POOL")
+        with docx_pool_lock:
+            if DOCX_POOL is pool:
+                DOCX_POOL = new_docx_pool()
+                pool.shutdown(wait=False, cancel_futures=True)
+            pool = DOCX_POOL
+        return pool.submit(build_docx_bytes, form_data, policy_lines).result(timeout=DOCX_BUILD_TIMEOUT)
+
+# One event loop thread per process owns the shared async client and its
+# connection pool; synchronous views hand coroutines to it with run_async
+event_loop = asyncio.new_event_loop()
+threading.Thread(target=event_loop.run_forever, daemon=True).start()
+
+def run_async(coro):
+    return asyncio.run_coroutine_threadsafe(coro, event_loop).result()
+
+def iterate_async(async_generator):
+    """Consume an async generator from synchronous code, one item at a time"""
+    finished = object()
+    
+    async def next_item():
+        return await anext(async_generator, finished)
+    
+    async def close():
+        await async_generator.aclose()
+    
+    try:
+        while True:
+            item = run_async(next_item())
+            if item is finished:
+                return
+            yield item
+    finally:
+        run_async(close())
 
-# Configure OpenAI for CrimsonAI hub using stable v0.28.1 API
+# Configure the async Azure OpenAI client for CrimsonAI hub, once per process
+@functools.lru_cache(maxsize=1)
 def configure_openai():
     api_key = os.getenv('AZURE_OPENAI_API_KEY')
     endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
@@ -17,19 +113,103 @@ def configure_openai():
     if not api_key or not endpoint:
         raise ValueError("Azure OpenAI credentials not configured")
     
-    openai.api_type = "azure"
-    openai.api_key = api_key
-    openai.api_base = endpoint
-    openai.api_version = "2024-12-01-preview"
+    return AsyncAzureOpenAI(
+        api_key=api_key,
+        azure_endpoint=endpoint,
+        api_version="2024-12-01-preview",
+        max_retries=0  # Retries are handled by create_completion
+    )
+
+def is_transient_error(error):
+    """Rate limits, timeouts and 5xx responses are worth retrying"""
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def log_retry(retry_state):
+    app.logger.warning(
+        f"Azure OpenAI call failed ({retry_state.outcome.exception()}), "
+        f"retrying in {retry_state.next_action.sleep:.1f}s (attempt {retry_state.attempt_number})"
+    )
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=1, max=8),
+    retry=retry_if_exception(is_transient_error),
+    before_sleep=log_retry,
+    reraise=True
+)
+async def create_completion(client, model_name, **kwargs):
+    return await client.chat.completions.create(model=model_name, **kwargs)
+
+try:
+    configure_openai()
+except ValueError as e:
+    app.logger.error(f"{str(e)}; policy generation will fail until it is set")
+
+async def close_response(response):
+    """Release the connection held by a streamed completion"""
+    close = getattr(response, 'close', None)
+    if close is not None:
+        await close()
+
+async def race_deployments(client, model_names, **kwargs):
+    """Send the same request to every deployment and return the first successful response"""
+    tasks = {
+        asyncio.create_task(create_completion(client, model_name, **kwargs)): model_name
+        for model_name in model_names
+    }
+    pending = set(tasks)
+    last_error = None
+    
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = []
+            for task in done:
+                if task.exception() is None:
+                    succeeded.append(task.result())
+                else:
+                    last_error = f"Model {tasks[task]}: {str(task.exception())}"
+            if succeeded:
+                # Both deployments can finish in the same batch; release the loser's stream
+                for response in succeeded[1:]:
+                    await close_response(response)
+                return succeeded[0]
+    finally:
+        # Cancel the slower deployment once we have a winner
+        for task in pending:
+            task.cancel()
+        results = await asyncio.gather(*pending, return_exceptions=True)
+        # A deployment can still finish before its cancellation lands
+        for result in results:
+            if not isinstance(result, BaseException):
+                await close_response(result)
+    
+    raise Exception(f"All models failed. Last error: {last_error}")
+
+# Shared secret APIM adds to every request it forwards (see apim_policy.xml);
+# when set, requests that bypass APIM are rejected
+BACKEND_SECRET = os.getenv('APIM_BACKEND_SECRET')
+
+@app.before_request
+def require_apim():
+    """Reject requests that did not come through API Management; probes stay open"""
+    if not BACKEND_SECRET or request.endpoint in ('health', 'ready'):
+        return None
+    if not hmac.compare_digest(request.headers.get('X-Backend-Secret', ''), BACKEND_SECRET):
+        return jsonify({'error': 'Forbidden'}), 403
 
 @app.route('/')
 def home():
     return render_template('index.html')
 
-def generate_policy_content(form_data):
-    """Generate policy content using CrimsonAI hub"""
-    try:
-        prompt = f"""You are a cybersecurity policy generator trained to write business-grade IT and security policies aligned with industry frameworks such as NIST 800-53 Rev. 5, SOC 2, SEC Cyber Risk Guidance, and CIS Controls. Your policies must follow this format:
+# Azure deployment names, raced against each other for every request
+MODEL_NAMES = ("gpt-5-chat", "gpt-4o")
+
+SYSTEM_MESSAGE = "You are an expert cybersecurity policy writer with deep knowledge of NIST frameworks, SOC 2, ISO 27001, CMMC, and industry best practices."
+
+PROMPT_TEMPLATE = string.Template("""You are a cybersecurity policy generator trained to write business-grade IT and security policies aligned with industry frameworks such as NIST 800-53 Rev. 5, SOC 2, SEC Cyber Risk Guidance, and CIS Controls. Your policies must follow this format:
 - A clear section heading for each topic
 - A short introductory paragraph explaining the purpose or intent of that section
 - A mix of both: lists of actionable bullet points or paragraphs that reflect standards and expected behaviors
@@ -44,16 +224,16 @@ IMPORTANT FORMATTING REQUIREMENTS:
 - Use simple bullet points with hyphens (-) not special characters
 - Keep formatting clean and professional
 
-Generate a comprehensive {form_data['policy_type']} for the following organization:
+Generate a comprehensive $policy_type for the following organization:
 
-Client: {form_data['client_name']}
-Industry: {form_data['industry']}
-Company Size: {form_data['company_size']}
-Technology Stack: {form_data['tech_stack']}
-Compliance Requirements: {form_data['compliance_requirements'] or 'General best practices'}
+Client: $client_name
+Industry: $industry
+Company Size: $company_size
+Technology Stack: $tech_stack
+Compliance Requirements: $compliance
 Managed Service Provider (MSP): Crimson IT
 Managed Security Service Provider (MSSP): Crimson IT
-Additional Requirements: {form_data['additional_requirements']}
+Additional Requirements: $additional_requirements
 
 The policy should be specifically tailored to this organization's context and include:
 1. Purpose and scope
@@ -63,291 +243,321 @@ The policy should be specifically tailored to this organization's context and in
 5. Compliance and monitoring requirements
 6. References to applicable frameworks
 
-Make sure to reference Crimson IT as the designated MSP and MSSP throughout the policy where appropriate."""
+Make sure to reference Crimson IT as the designated MSP and MSSP throughout the policy where appropriate.""")
 
-        configure_openai()
-        
-        # Try your exact Azure deployment names first
-        model_names = ["gpt-5-chat", "gpt-4o"]
-        
-        response = None
-        last_error = None
-        
-        for model_name in model_names:
-            try:
-                response = openai.ChatCompletion.create(
-                    engine=model_name,
-                    messages=[
-                        {"role": "system", "content": "You are an expert cybersecurity policy writer with deep knowledge of NIST frameworks, SOC 2, ISO 27001, CMMC, and industry best practices."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=4000,
-                    temperature=0.7
-                )
-                break  # Success, exit the loop
-            except Exception as model_error:
-                last_error = f"Model {model_name}: {str(model_error)}"
-                continue  # Try next model
-        
-        if response is None:
-            raise Exception(f"All models failed. Last error: {last_error}")
-        
-        content = response.choices[0].message.content
-        
-        # Clean up the response - remove conversational elements and formatting issues
-        # Remove common AI prefixes
-        prefixes_to_remove = [
-            "Certainly!", "Certainly,", "Certainly.", "Sure!", "Sure,", "Of course!", "Of course,",
-            "Here is", "Here's", "Below is", "I'll", "I can", "Let me", "I'd be happy to",
-            "Here you go", "Absolutely!", "Absolutely,", "No problem!", "No problem,",
-            "I have aligned", "I have created", "This policy", "The following"
-        ]
-        
-        for prefix in prefixes_to_remove:
-            if content.strip().startswith(prefix):
-                content = content.strip()[len(prefix):].strip()
-                break
-        
-        # Remove em dashes and replace with hyphens
-        content = content.replace('—', '-')
-        content = content.replace('–', '-')
-        
-        # Remove bold formatting markers
-        content = content.replace('**', '')
-        
-        # Clean up bullet points - standardize to hyphens
-        content = content.replace('•', '-')
-        content = content.replace('◦', '-')
-        content = content.replace('▪', '-')
-        
-        # Remove common AI suffixes and additional offers
-        lines = content.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            # Skip lines that contain AI conversation elements
-            if any(phrase in line.lower() for phrase in [
-                "if you'd like", "would you like", "let me know if", "feel free to",
-                "i can also", "i'd be happy to", "please let me know",
-                "if you need", "would you prefer", "shall i", "do you want",
-                "comprehensive information security policy", "tailored to the organization",
-                "i have aligned", "aligned it with", "below is a", "here is a"
-            ]):
-                continue
-            # Skip lines that are just formatting artifacts
-            if line in ['--', '____________________________________________________________', '•', '◦', '▪']:
-                continue
-            # Skip duplicate title lines
-            if line.lower().startswith('abilityfirst') and 'information security policy' in line.lower():
-                continue
-            if line:
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
-        
-    except Exception as e:
-        return f"Error generating policy content: {str(e)}"
+class PolicyRequest(BaseModel):
+    """Policy details submitted from the generator form"""
+    model_config = ConfigDict(str_strip_whitespace=True)
+    
+    client_name: str = Field(min_length=1)
+    industry: str = Field(min_length=1)
+    company_size: str = Field(min_length=1)
+    policy_type: str = Field(min_length=1)
+    compliance_requirements: str = ''
+    additional_requirements: str = ''
+
+# Response cleanup patterns, compiled once at import
+AI_PREFIXES = [
+    "Certainly!", "Certainly,", "Certainly.", "Sure!", "Sure,", "Of course!", "Of course,",
+    "Here is", "Here's", "Below is", "I'll", "I can", "Let me", "I'd be happy to",
+    "Here you go", "Absolutely!", "Absolutely,", "No problem!", "No problem,",
+    "I have aligned", "I have created", "This policy", "The following"
+]
+AI_PHRASES = [
+    "if you'd like", "would you like", "let me know if", "feel free to",
+    "i can also", "i'd be happy to", "please let me know",
+    "if you need", "would you prefer", "shall i", "do you want",
+    "comprehensive information security policy", "tailored to the organization",
+    "i have aligned", "aligned it with", "below is a", "here is a"
+]
+AI_PREFIX_RE = re.compile(r'^(?:' + '|'.join(map(re.escape, AI_PREFIXES)) + r')\s*')
+AI_PHRASE_RE = re.compile('|'.join(map(re.escape, AI_PHRASES)), re.IGNORECASE)
+HYPHEN_TRANSLATION = str.maketrans({'—': '-', '–': '-', '•': '-', '◦': '-', '▪': '-'})
+FORMATTING_ARTIFACTS = frozenset(['--', '_' * 60])
+
+def clean_policy_lines(lines):
+    """Clean up the response - remove conversational elements and formatting issues"""
+    strip_prefix = True
+    
+    for line in lines:
+        line = line.strip()
+        # Remove common AI prefixes from the start of the response
+        if strip_prefix and line:
+            line = AI_PREFIX_RE.sub('', line, count=1).strip()
+            strip_prefix = False
+        
+        # Replace em dashes and special bullets with hyphens, remove bold markers
+        line = line.translate(HYPHEN_TRANSLATION).replace('**', '')
+        
+        # Skip lines that contain AI conversation elements
+        if AI_PHRASE_RE.search(line):
+            continue
+        # Skip lines that are just formatting artifacts
+        if line in FORMATTING_ARTIFACTS:
+            continue
+        # Skip duplicate title lines
+        if line.lower().startswith('abilityfirst') and 'information security policy' in line.lower():
+            continue
+        if line:
+            yield line
+
+def split_lines(chunks):
+    """Regroup streamed text chunks into complete lines"""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split('\n')
+        yield from lines
+    yield buffer
+
+async def stream_policy_text(form_data):
+    """Stream raw policy text from whichever Azure deployment responds first"""
+    prompt = PROMPT_TEMPLATE.substitute(
+        **form_data,
+        compliance=form_data['compliance_requirements'] or 'General best practices'
+    )
+    
+    # Race both Azure deployments and keep whichever starts streaming first
+    response = await race_deployments(
+        configure_openai(),
+        MODEL_NAMES,
+        messages=[
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=4000,
+        temperature=0.7,
+        top_p=1.0,
+        stream=True
+    )
+    
+    # Close the upstream stream even if the consumer stops early (e.g. the
+    # SSE client disconnects), so the Azure connection is not left open
+    async with response:
+        async for chunk in response:
+            # Azure sends content filter results in chunks without choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-def create_word_document(form_data, policy_content):
-    """Create a professional Word document"""
+class PolicyGenerationError(Exception):
+    """Raised when no model deployment produced a policy"""
+
+async def generate_policy_content(form_data):
+    """Generate cleaned policy lines using CrimsonAI hub"""
     try:
-        doc = Document()
-        
-        # Set document margins
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1.25)
-            section.right_margin = Inches(1.25)
-        
-        # Add header with Crimson IT branding
-        header_para = doc.add_paragraph()
-        header_run = header_para.add_run('CRIMSON IT')
-        header_run.bold = True
-        header_para.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        
-        # Add main title
-        title_para = doc.add_paragraph()
-        title_run = title_para.add_run(form_data['client_name'].upper())
-        title_run.bold = True
-        title_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add subtitle
-        subtitle_para = doc.add_paragraph()
-        subtitle_run = subtitle_para.add_run(form_data['policy_type'])
-        subtitle_run.bold = True
-        subtitle_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add generation info
-        info_para = doc.add_paragraph()
-        info_para.add_run(f'Document Generated: {datetime.now().strftime("%B %d, %Y")}').italic = True
-        info_para.add_run('\nManaged by: Crimson IT (MSP/MSSP)').italic = True
-        info_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Add separator
-        doc.add_paragraph('_' * 60).alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_paragraph()
-        
-        # Add policy content
-        lines = policy_content.split('\n')
-        current_paragraph = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                if current_paragraph:
-                    doc.add_paragraph()
-                current_paragraph = None
-                continue
-                
-            if line.startswith('##'):
-                doc.add_heading(line.replace('##', '').strip(), level=2)
-                current_paragraph = None
-            elif line.startswith('#'):
-                doc.add_heading(line.replace('#', '').strip(), level=1)
-                current_paragraph = None
-            elif line.endswith(':') or (line.isupper() and len(line) > 10):
-                doc.add_heading(line.rstrip(':'), level=2)
-                current_paragraph = None
-            elif line.startswith('-') or line.startswith('•') or line.startswith('* '):
-                bullet_text = line[1:].strip() if line.startswith('-') else line[2:].strip()
-                doc.add_paragraph(bullet_text, style='List Bullet')
-                current_paragraph = None
-            elif line.startswith(tuple('123456789')) and ('. ' in line[:5] or ') ' in line[:5]):
-                doc.add_paragraph(line, style='List Number')
-                current_paragraph = None
-            else:
-                if current_paragraph is None:
-                    current_paragraph = doc.add_paragraph()
-                if current_paragraph.text:
-                    current_paragraph.add_run(' ')
-                current_paragraph.add_run(line)
-        
-        # Add footer
-        doc.add_paragraph()
-        footer_para = doc.add_paragraph()
-        footer_para.add_run('This document was generated by Crimson IT\'s AI-powered policy generator.').italic = True
-        footer_para.add_run('\nFor questions or updates, contact your Crimson IT representative.').italic = True
-        footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        return doc
-        
+        chunks = [text async for text in stream_policy_text(form_data)]
     except Exception as e:
-        raise Exception(f"Error creating Word document: {str(e)}")
+        raise PolicyGenerationError(f"Error generating policy content: {str(e)}") from e
+    return list(clean_policy_lines(split_lines(chunks)))
+
+def policy_cache_key(form_hash):
+    return f'policy_lines:{form_hash}'
+
+def policy_form_key(form_hash):
+    return f'policy_form:{form_hash}'
+
+def cached_policy_content(form_hash, form_json):
+    """Generate policy lines once per unique form submission"""
+    policy_lines = cache.get(policy_cache_key(form_hash))
+    if policy_lines is None:
+        policy_lines = run_async(generate_policy_content(json.loads(form_json)))
+        cache.set(policy_cache_key(form_hash), policy_lines)
+    return policy_lines
+
+def get_form_data():
+    """Validate the submitted form and combine the technology selections"""
+    form_data = PolicyRequest.model_validate(request.form.to_dict()).model_dump()
+    
+    # Collect technology stack from individual dropdown fields
+    tech_components = []
+    tech_fields = [
+        'platform_choice', 'mdr_solution', 'email_security', 'siem_solution',
+        'pam_solution', 'disk_encryption', 'mdm_computers', 'mdm_mobile', 'security_training',
+        'phishing_tests', 'vulnerability_scans', 'dark_web_monitoring', 'mfa_solution', 
+        'password_manager', 'intrusion_detection', 'additional_tech'
+    ]
+    
+    for field in tech_fields:
+        value = request.form.get(field, '').strip()
+        if value and value != 'None':
+            tech_components.append(value)
+    
+    # Combine all technology selections into tech_stack
+    form_data['tech_stack'] = ', '.join(tech_components) if tech_components else 'Standard business technology stack'
+    
+    return form_data
+
+# Characters allowed in download filenames: letters, digits, space, hyphen, underscore
+UNSAFE_FILENAME_RE = re.compile(r'[^\w \-]+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+def safe_filename_part(value):
+    return WHITESPACE_RE.sub('_', UNSAFE_FILENAME_RE.sub('', value).strip())
+
+def missing_fields_response(error):
+    missing_fields = [str(e['loc'][0]) for e in error.errors()]
+    return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+
+@app.route('/generate_policy/stream', methods=['POST'])
+def generate_policy_stream():
+    """Stream cleaned policy lines as Server-Sent Events while the model writes"""
+    try:
+        form_data = get_form_data()
+    except ValidationError as e:
+        return missing_fields_response(e)
+    
+    form_json = json.dumps(form_data, sort_keys=True)
+    form_hash = hashlib.sha256(form_json.encode()).hexdigest()
+    download_url = url_for('download_policy', form_hash=form_hash)
+    
+    def events():
+        lines = []
+        try:
+            chunks = iterate_async(stream_policy_text(form_data))
+            for line in clean_policy_lines(split_lines(chunks)):
+                lines.append(line)
+                yield f"data: {json.dumps(line)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps(f'Error generating policy content: {str(e)}')}\n\n"
+            return
+        
+        # Let the client download the streamed text as a document
+        cache.set(policy_cache_key(form_hash), lines)
+        cache.set(policy_form_key(form_hash), form_json)
+        yield f"event: done\ndata: {json.dumps({'download_url': download_url})}\n\n"
+    
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 @app.route('/generate_policy', methods=['POST'])
 def generate_policy():
     try:
-        # Get form data
-        form_data = {
-            'client_name': request.form.get('client_name', '').strip(),
-            'industry': request.form.get('industry', '').strip(),
-            'company_size': request.form.get('company_size', '').strip(),
-            'policy_type': request.form.get('policy_type', '').strip(),
-            'compliance_requirements': request.form.get('compliance_requirements', '').strip(),
-            'additional_requirements': request.form.get('additional_requirements', '').strip()
-        }
-        
-        # Collect technology stack from individual dropdown fields
-        tech_components = []
-        tech_fields = [
-            'platform_choice', 'mdr_solution', 'email_security', 'siem_solution',
-            'pam_solution', 'disk_encryption', 'mdm_computers', 'mdm_mobile', 'security_training',
-            'phishing_tests', 'vulnerability_scans', 'dark_web_monitoring', 'mfa_solution', 
-            'password_manager', 'intrusion_detection', 'additional_tech'
-        ]
-        
-        for field in tech_fields:
-            value = request.form.get(field, '').strip()
-            if value and value != 'None':
-                tech_components.append(value)
-        
-        # Combine all technology selections into tech_stack
-        form_data['tech_stack'] = ', '.join(tech_components) if tech_components else 'Standard business technology stack'
-        
-        # Validate required fields
-        required_fields = ['client_name', 'industry', 'company_size', 'policy_type', 'tech_stack']
-        missing_fields = [field for field in required_fields if not form_data[field]]
-        
-        if missing_fields:
-            return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
+        # Get and validate form data
+        try:
+            form_data = get_form_data()
+        except ValidationError as e:
+            return missing_fields_response(e)
         
         # Generate policy content using CrimsonAI
-        policy_content = generate_policy_content(form_data)
+        form_json = json.dumps(form_data, sort_keys=True)
+        form_hash = hashlib.sha256(form_json.encode()).hexdigest()
         
-        if policy_content.startswith("Error generating policy content:"):
-            return jsonify({'error': policy_content}), 500
+        try:
+            cached_policy_content(form_hash, form_json)
+        except PolicyGenerationError as e:
+            return jsonify({'error': str(e)}), 500
+        cache.set(policy_form_key(form_hash), form_json)
         
-        # Create Word document
-        doc = create_word_document(form_data, policy_content)
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp_file:
-            doc.save(tmp_file.name)
-            
-            # Generate safe filename
-            safe_client_name = "".join(c for c in form_data['client_name'] if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            safe_policy_type = "".join(c for c in form_data['policy_type'] if c.isalnum() or c in (' ', '-', '_')).rstrip()
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M')
-            filename = f"{safe_client_name}_{safe_policy_type}_{timestamp}.docx"
+        # Hand the download off to a GET URL so browsers can cache and revalidate it
+        return redirect(url_for('download_policy', form_hash=form_hash), code=303)
             
-            return send_file(
-                tmp_file.name,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            )
+    except Exception as e:
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@app.route('/generate_policy/<form_hash>', methods=['GET'])
+def download_policy(form_hash):
+    """Download the Word document for a previously generated policy"""
+    try:
+        # The form hash doubles as the document's ETag, so a client that
+        # already has this policy can skip the download entirely
+        if form_hash in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(form_hash)
+            return response
+        
+        form_json = cache.get(policy_form_key(form_hash))
+        policy_lines = cache.get(policy_cache_key(form_hash))
+        if form_json is None or policy_lines is None:
+            return jsonify({'error': 'Policy not found or expired; please submit the form again'}), 404
+        form_data = json.loads(form_json)
+        
+        # Create Word document in a worker process and keep only the bytes
+        buffer = io.BytesIO(build_docx_in_pool(form_data, policy_lines))
+        
+        # Generate safe filename
+        safe_client_name = safe_filename_part(form_data['client_name'])
+        safe_policy_type = safe_filename_part(form_data['policy_type'])
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M')
+        filename = f"{safe_client_name}_{safe_policy_type}_{timestamp}.docx"
+        
+        response = send_file(
+            buffer,
+            as_attachment=True,
+            download_name=filename,
+            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+        )
+        response.set_etag(form_hash)
+        response.headers['Cache-Control'] = 'private, max-age=3600'
+        return response
             
     except Exception as e:
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
 
+async def probe_models(model_names):
+    """Send a minimal completion to each deployment concurrently"""
+    async def probe(client, model):
+        try:
+            await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": "Hello"}],
+                max_tokens=5
+            )
+            return "available"
+        except Exception as e:
+            return f"error: {str(e)}"
+    
+    client = configure_openai()
+    results = await asyncio.gather(*(probe(client, model) for model in model_names))
+    return dict(zip(model_names, results))
+
+# Credentials only change on restart, so the liveness payload is built once
+HEALTH_INFO = {
+    "status": "healthy",
+    "version": "2.0.2",
+    "openai_configured": bool(os.getenv('AZURE_OPENAI_API_KEY') and os.getenv('AZURE_OPENAI_ENDPOINT')),
+    "env_check": {
+        "api_key_present": bool(os.getenv('AZURE_OPENAI_API_KEY')),
+        "endpoint_present": bool(os.getenv('AZURE_OPENAI_ENDPOINT'))
+    }
+}
+HEALTH_BODY = app.json.dumps(HEALTH_INFO)
+
+# Readiness probes can hit /ready frequently; reuse the live model check
+# for a minute instead of calling Azure on every request
+@cache.cached(timeout=60, key_prefix='health_probe')
+def cached_model_availability():
+    return run_async(probe_models(MODEL_NAMES))
+
 @app.route('/health')
 def health():
+    """Liveness check; never calls Azure"""
+    return Response(HEALTH_BODY, mimetype='application/json')
+
+@app.route('/ready')
+def ready():
+    """Readiness check; probes each model deployment at most once a minute"""
     try:
-        # Check if environment variables are available
-        api_key = os.getenv('AZURE_OPENAI_API_KEY')
-        endpoint = os.getenv('AZURE_OPENAI_ENDPOINT')
-        
-        health_info = {
-            "status": "healthy", 
-            "version": "2.0.2",
-            "openai_configured": bool(api_key and endpoint),
-            "env_check": {
-                "api_key_present": bool(api_key),
-                "endpoint_present": bool(endpoint)
-            }
-        }
+        ready_info = dict(HEALTH_INFO)
         
         # Test OpenAI connection if configured
-        if api_key and endpoint:
+        if HEALTH_INFO["openai_configured"]:
             try:
-                configure_openai()
                 # Try a simple test with each model
-                test_results = {}
-                model_names = ["gpt-5-chat", "gpt-4o"]
-                
-                for model in model_names:
-                    try:
-                        response = openai.ChatCompletion.create(
-                            engine=model,
-                            messages=[{"role": "user", "content": "Hello"}],
-                            max_tokens=5
-                        )
-                        test_results[model] = "available"
-                    except Exception as e:
-                        test_results[model] = f"error: {str(e)}"
+                test_results = cached_model_availability()
                 
-                health_info["model_availability"] = test_results
+                ready_info["model_availability"] = test_results
                 
             except Exception as e:
-                health_info["openai_test_error"] = str(e)
+                ready_info["openai_test_error"] = str(e)
+        
+        if "available" not in ready_info.get("model_availability", {}).values():
+            ready_info["status"] = "unavailable"
+            return ready_info, 503
         
-        return health_info
+        return ready_info
     except Exception as e:
         return {"status": "error", "error": str(e)}, 500
 
+# Local debugging only; production runs under gunicorn (see Procfile)
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -14,15 +14,12 @@ from datetime import datetime
 import logging
 
 # Import IT Glue integration module
-from itglue_integration import ITGlueIntegration
+from itglue_integration import get_itglue
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize IT Glue integration
-itglue = ITGlueIntegration()
-
 # Configure OpenAI for CrimsonAI hub using stable v0.28.1 API
 def configure_openai():
     api_key = os.getenv('AZURE_OPENAI_API_KEY')
@@ -49,7 +46,7 @@ def get_organizations():
     Used to populate the searchable dropdown
     """
     try:
-        organizations = itglue.get_active_organizations()
+        organizations = get_itglue().get_active_organizations()
         return jsonify({
             'success': True,
             'organizations': organizations,
@@ -70,7 +67,7 @@ def get_organization_profile(org_id):
     """
     try:
         # Get profile from IT Glue
-        profile = itglue.get_organization_profile(org_id)
+        profile = get_itglue().get_organization_profile(org_id)
 
         if not profile:
             return jsonify({
@@ -79,7 +76,7 @@ def get_organization_profile(org_id):
             }), 404
 
         # Map profile to form fields
-        form_data = itglue.map_profile_to_form_data(profile)
+        form_data = get_itglue().map_profile_to_form_data(profile)
 
         return jsonify({
             'success': True,
@@ -358,7 +355,7 @@ def generate_policy():
                 if form_data['compliance_requirements']:
                     compliance_frameworks.append(form_data['compliance_requirements'])
 
-                save_result = itglue.save_policy_to_itglue(
+                save_result = get_itglue().save_policy_to_itglue(
                     org_id=org_id,
                     policy_name=policy_name,
                     policy_content=policy_content,
@@ -4,126 +4,428 @@ Direct connection to IT Glue API
 """
 
 import os
-import requests
-from typing import Dict, List, Optional
+import re
+import math
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import ahocorasick
+import httpx
+import orjson
+from cachetools import LRUCache, TTLCache
+from typing import Dict, List, Optional, Set
 import logging
 
+# Optional: hyperscan is faster for large keyword scans, where installed
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
 logger = logging.getLogger(__name__)
 
-class ITGlueIntegration:
-    """Direct interface to IT Glue API"""
+# Throttled and transient server responses are retried with exponential backoff
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF = 0.3
+
+# Stay under IT Glue's rate limit however many threads or tasks are fetching
+MAX_IN_FLIGHT = 10
+REQUESTS_PER_SECOND = 10
+# Longest Retry-After we wait out; asking for more fails the call instead of
+# parking a request thread
+RETRY_AFTER_MAX = 5.0
+
+# JSON:API sparse fieldsets: only request the attributes this module reads
+ORGANIZATION_FIELDS = {'fields[organizations]': 'name,organization-type-name,organization-status-name'}
+CONFIGURATION_FIELDS = {'fields[configurations]': 'name,notes,configuration-type-name,configuration-status-name'}
+
+# Keywords looked for in configuration text. A detector only sees keywords
+# listed here, so add new ones alongside their TECH_STACK_RULES entry.
+TECH_STACK_KEYWORDS = [
+    'microsoft 365', 'office 365', 'azure', 'o365', 'google workspace', 'gmail', 'gsuite',
+    'sophos', 'crowdstrike', 'sentinel', 'antivirus', 'defender',
+    'avanan', 'atp', 'proofpoint', 'mimecast',
+    'siem', 'splunk', 'log', 'monitor',
+    'senhasegura', 'cyberark', 'thycotic', 'beyondtrust',
+    'bitlocker', 'filevault',
+    'intune', 'jamf', 'airwatch',
+    'knowbe4', 'monthly', 'phishing',
+    'vulnerability', 'nessus', 'qualys',
+    'darkwebid', 'dark web', 'breach',
+    'microsoft', 'mfa', 'authenticator', 'duo', 'two-factor', '2fa',
+    'lastpass', '1password', 'dashlane', 'keeper',
+    'ids', 'ips', 'intrusion', 'firewall', 'sonicwall', 'fortinet', 'palo alto', 'meraki'
+]
+COMPLIANCE_KEYWORDS = [
+    'hipaa', 'pci', 'nist', 'soc 2', 'soc2', 'iso 27001', 'iso27001', 'gdpr', 'cmmc'
+]
+
+# Detection rules for _map_technology_stack, evaluated in order against the
+# keyword hits: (form field, cases, default). Each case is (condition, value);
+# a condition is a tuple of keyword sets and matches when every set has a hit.
+# The first matching case wins, otherwise the default (if any) is used.
+TECH_STACK_RULES = (
+    ('platform_choice', (
+        (({'microsoft 365', 'office 365', 'azure', 'o365'},), 'Microsoft 365 / Azure'),
+        (({'google workspace', 'gmail', 'gsuite'},), 'Google Workspace')
+    ), 'Microsoft 365 / Azure'),
+    ('mdr_solution', (
+        (({'sophos'},), 'Sophos MDR'),
+        (({'crowdstrike', 'sentinel'},), 'Other MDR'),
+        (({'antivirus', 'defender'},), 'Traditional Antivirus Only')
+    ), 'Sophos MDR'),  # Crimson IT default
+    ('email_security', (
+        (({'avanan'},), 'Avanan Email Security'),
+        (({'defender', 'atp'},), 'Microsoft Defender'),
+        (({'proofpoint', 'mimecast'},), 'Other Email Security')
+    ), None),
+    ('siem_solution', (
+        (({'siem', 'splunk', 'sentinel'},), 'SIEM with SOC monitoring'),
+        (({'log'}, {'monitor'}), 'Basic log collection')
+    ), None),
+    ('pam_solution', (
+        (({'senhasegura'},), 'Senhasegura PAM'),
+        (({'cyberark', 'thycotic', 'beyondtrust'},), 'Other PAM')
+    ), None),
+    ('disk_encryption', (
+        (({'bitlocker'}, {'filevault'}), 'Both BitLocker and FileVault'),
+        (({'bitlocker'},), 'BitLocker (Windows)'),
+        (({'filevault'},), 'FileVault (macOS)')
+    ), None),
+    ('mdm_computers', (
+        (({'intune'},), 'Microsoft Intune'),
+        (({'jamf', 'airwatch'},), 'Other MDM')
+    ), None),
+    ('mdm_mobile', (
+        (({'intune'},), 'Microsoft Intune'),
+        (({'jamf', 'airwatch'},), 'Other MDM')
+    ), None),
+    ('security_training', (
+        (({'knowbe4'}, {'monthly'}), 'KnowBe4 Monthly Training'),
+        (({'knowbe4'},), 'KnowBe4 Quarterly Training')
+    ), None),
+    ('phishing_tests', (
+        (({'knowbe4', 'phishing'},), 'Monthly Phishing Tests'),
+    ), None),
+    ('vulnerability_scans', (
+        (({'vulnerability', 'nessus', 'qualys'}, {'monthly'}), 'Monthly Vulnerability Scans'),
+        (({'vulnerability', 'nessus', 'qualys'},), 'Quarterly Vulnerability Scans')
+    ), None),
+    ('dark_web_monitoring', (
+        (({'darkwebid', 'dark web'},), 'DarkWebID Monitoring'),
+        (({'breach'}, {'monitor'}), 'Other Dark Web Monitoring')
+    ), None),
+    ('mfa_solution', (
+        (({'microsoft'}, {'mfa', 'authenticator'}), 'Microsoft MFA'),
+        (({'duo'},), 'Duo Security'),
+        (({'mfa', 'two-factor', '2fa'},), 'Other MFA')
+    ), None),
+    ('password_manager', (
+        (({'lastpass'},), 'LastPass Business'),
+        (({'1password', 'dashlane', 'keeper'},), 'Other Password Manager')
+    ), None),
+    ('intrusion_detection', (
+        (({'ids', 'ips', 'intrusion'},), 'Network Intrusion Detection System'),
+        (({'firewall'}, {'sonicwall', 'fortinet', 'palo alto'}), 'Firewall with IDS/IPS'),
+        (({'firewall', 'meraki'},), 'Basic Firewall')
+    ), None)
+)
+
+class HyperscanMatcher:
+    """Hyperscan keyword database with the same iter() interface as an Aho-Corasick automaton"""
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self.database = hyperscan.Database()
+        self.database.compile(
+            expressions=[re.escape(keyword).encode() for keyword in self.keywords],
+            ids=list(range(len(self.keywords))),
+            elements=len(self.keywords),
+            flags=[hyperscan.HS_FLAG_SINGLEMATCH] * len(self.keywords)
+        )
+        # Scratch space can't be shared by concurrent scans, so keep one per thread
+        self._local = threading.local()
+
+    def iter(self, text: str) -> List[tuple]:
+        """Return (end offset, keyword) for each keyword found in text"""
+        scratch = getattr(self._local, 'scratch', None)
+        if scratch is None:
+            scratch = self._local.scratch = hyperscan.Scratch(self.database)
+
+        matches = []
+
+        def on_match(keyword_id, start, end, flags, context):
+            matches.append((end, self.keywords[keyword_id]))
+
+        self.database.scan(text.encode(), match_event_handler=on_match, scratch=scratch)
+        return matches
+
+def build_keyword_automaton(keywords: List[str]):
+    """Matcher that finds every keyword in a single pass (Hyperscan, else Aho-Corasick)"""
+    if hyperscan is not None:
+        return HyperscanMatcher(keywords)
+
+    automaton = ahocorasick.Automaton()
+    for keyword in keywords:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+def find_keywords(automaton, text: str) -> Set[str]:
+    """Return the set of keywords that occur anywhere in text (overlaps included)"""
+    return {keyword for _, keyword in automaton.iter(text)}
+
+class TokenBucket:
+    """Thread-safe token bucket; each caller reserves a token and waits the returned delay"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token, returning the seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative: later callers queue up behind earlier ones
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+
+def retry_delay(response: httpx.Response, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying, honouring Retry-After on 429 responses
+    Returns None when the server asks us to wait longer than RETRY_AFTER_MAX
+    """
+    if response.status_code == 429:
+        try:
+            retry_after = float(response.headers.get('Retry-After', ''))
+        except ValueError:
+            retry_after = None
+        if retry_after is not None and math.isfinite(retry_after) and retry_after >= 0:
+            return retry_after if retry_after <= RETRY_AFTER_MAX else None
+    return RETRY_BACKOFF * 2 ** attempt
+
+TECH_STACK_AUTOMATON = build_keyword_automaton(TECH_STACK_KEYWORDS)
+COMPLIANCE_AUTOMATON = build_keyword_automaton(COMPLIANCE_KEYWORDS)
+
+# Configuration type keywords in priority order, mapped to their tech stack bucket
+KEYWORD_BUCKET = {
+    'server': 'endpoints',
+    'workstation': 'endpoints',
+    'laptop': 'endpoints',
+    'firewall': 'network',
+    'switch': 'network',
+    'router': 'network',
+    'security': 'security',
+    'antivirus': 'security',
+    'cloud': 'cloud',
+    'saas': 'cloud'
+}
+
+@functools.lru_cache(maxsize=1024)
+def config_type_bucket(config_type: str) -> str:
+    """Tech stack bucket for a configuration type name"""
+    # Organizations reuse a handful of type names across thousands of
+    # configurations, so each distinct name is only scanned once
+    config_type = config_type.lower()
+    for keyword, bucket in KEYWORD_BUCKET.items():
+        if keyword in config_type:
+            return bucket
+    return 'other'
+
+# Organization type keywords in priority order; the first one present decides the industry
+INDUSTRY_KEYWORDS = (
+    ('healthcare', 'Healthcare'),
+    ('medical', 'Healthcare'),
+    ('hospital', 'Healthcare'),
+    ('clinic', 'Healthcare'),
+    ('financial', 'Financial Services'),
+    ('bank', 'Financial Services'),
+    ('investment', 'Financial Services'),
+    ('manufacturing', 'Manufacturing'),
+    ('factory', 'Manufacturing'),
+    ('retail', 'Retail'),
+    ('store', 'Retail'),
+    ('shop', 'Retail'),
+    ('technology', 'Technology'),
+    ('software', 'Technology'),
+    ('saas', 'Technology'),
+    ('education', 'Education'),
+    ('school', 'Education'),
+    ('university', 'Education'),
+    ('legal', 'Legal'),
+    ('law', 'Legal'),
+    ('attorney', 'Legal')
+)
+INDUSTRY_AUTOMATON = ahocorasick.Automaton()
+for priority, (keyword, _) in enumerate(INDUSTRY_KEYWORDS):
+    INDUSTRY_AUTOMATON.add_word(keyword, priority)
+INDUSTRY_AUTOMATON.make_automaton()
+
+# Detected frameworks mapped to the form's compliance dropdown options
+COMPLIANCE_FORM_OPTIONS = {
+    'NIST': 'NIST Cybersecurity Framework',
+    'SOC 2': 'SOC 2 Type II',
+    'ISO 27001': 'ISO 27001',
+    'HIPAA': 'HIPAA',
+    'PCI-DSS': 'PCI DSS',
+    'PCI': 'PCI DSS',
+    'GDPR': 'GDPR',
+    'CMMC': 'CMMC Level 2'
+}
+COMPLIANCE_PRIORITY = tuple(COMPLIANCE_FORM_OPTIONS)
+
+class BaseITGlueIntegration:
+    """
+    Credentials, caches, response handling and profile mapping shared by the
+    sync and async IT Glue clients; subclasses own the transport
+    """
 
     def __init__(self):
         # IT Glue API credentials from environment variables
         self.api_key = os.getenv('ITGLUE_API_KEY')
         self.api_base_url = 'https://api.itglue.com'
         self.timeout = 30
-
-        if not self.api_key:
-            logger.warning("IT Glue API key not configured. Set ITGLUE_API_KEY environment variable.")
-
-    def _make_request(self, method: str, endpoint: str, params: Dict = None) -> Dict:
-        """Make request to IT Glue API"""
-        if not self.api_key:
-            return {'success': False, 'error': 'IT Glue API key not configured'}
-
-        url = f"{self.api_base_url}/{endpoint.lstrip('/')}"
-
-        headers = {
-            'x-api-key': self.api_key,
+        self.headers = {
+            'x-api-key': self.api_key or '',
             'Content-Type': 'application/vnd.api+json',
             'Accept': 'application/vnd.api+json'
         }
 
-        try:
-            response = requests.request(
-                method=method.upper(),
-                url=url,
-                headers=headers,
-                params=params,
-                timeout=self.timeout
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"IT Glue API error: {str(e)}")
-            return {'success': False, 'error': str(e)}
-
-    def get_active_organizations(self) -> List[Dict]:
-        """Get list of active client organizations for dropdown"""
-        try:
-            # Get organizations with active status
-            result = self._make_request('GET', '/organizations', params={
-                'page[size]': 500,  # Get up to 500 organizations
-                'sort': 'name'
-            })
-
-            if not result or 'data' not in result:
-                logger.error(f"Failed to get organizations: {result.get('error', 'Unknown error')}")
-                return []
-
-            # Parse IT Glue response format
-            organizations = []
-            for org in result.get('data', []):
-                attributes = org.get('attributes', {})
-                org_status = attributes.get('organization-status-name', '').lower()
-
-                # Filter for active organizations
-                if 'active' in org_status:
-                    organizations.append({
-                        'id': org.get('id'),
-                        'name': attributes.get('name', ''),
-                        'type': attributes.get('organization-type-name', ''),
-                        'status': attributes.get('organization-status-name', '')
-                    })
-
-            logger.info(f"Retrieved {len(organizations)} active organizations from IT Glue")
-            return organizations
-
-        except Exception as e:
-            logger.error(f"Error getting organizations: {str(e)}")
-            return []
-
-    def get_organization_profile(self, org_id: int) -> Optional[Dict]:
-        """Get comprehensive organization profile for policy generation"""
-        try:
-            # Get organization details
-            org_result = self._make_request('GET', f'/organizations/{org_id}')
+        if not self.api_key:
+            logger.warning("IT Glue API key not configured. Set ITGLUE_API_KEY environment variable.")
 
-            if not org_result or 'data' not in org_result:
-                logger.error(f"Failed to get organization {org_id}")
-                return None
+        # Requests from every pool and task share one rate limit
+        self._rate_limiter = TokenBucket(REQUESTS_PER_SECOND)
+
+        # Organization lists and profiles change slowly; serve repeats from memory.
+        # GET bodies are also kept with their ETag for conditional revalidation.
+        self._cache = TTLCache(maxsize=256, ttl=600)
+        self._profile_cache = TTLCache(maxsize=256, ttl=300)
+        # Technology keywords found while building each cached profile, by organization id
+        self._keyword_cache = TTLCache(maxsize=256, ttl=300)
+        self._etag_cache = LRUCache(maxsize=512)
+        self._cache_lock = threading.Lock()
+
+    def _cache_get(self, cache, key):
+        with self._cache_lock:
+            return cache.get(key)
+
+    def _cache_set(self, cache, key, value):
+        with self._cache_lock:
+            cache[key] = value
+
+    def _conditional_request(self, method: str, url: str, params: Dict = None):
+        """Return (ETag cache key, headers) for a request, revalidating cached GETs"""
+        if method.upper() != 'GET':
+            return None, None
+        key = (url, tuple(sorted((params or {}).items())))
+        cached = self._cache_get(self._etag_cache, key)
+        return key, {'If-None-Match': cached[0]} if cached else None
+
+    def _read_response(self, response: httpx.Response, etag_key) -> Dict:
+        """Decode a response, answering 304 Not Modified from the ETag cache"""
+        if response.status_code == 304 and etag_key:
+            cached = self._cache_get(self._etag_cache, etag_key)
+            if cached:
+                return cached[1]
+
+        response.raise_for_status()
+        body = orjson.loads(response.content)
+        if etag_key and response.headers.get('ETag'):
+            self._cache_set(self._etag_cache, etag_key, (response.headers['ETag'], body))
+        return body
+
+    def _prepare_request(self, method: str, endpoint: str, params: Dict = None):
+        """Return (url, ETag cache key, headers) for an API call"""
+        url = f"{self.api_base_url}/{endpoint.lstrip('/')}"
+        etag_key, headers = self._conditional_request(method, url, params)
+        return url, etag_key, headers
 
-            org_data = org_result.get('data', {})
-            attributes = org_data.get('attributes', {})
+    def _next_retry_delay(self, response: httpx.Response, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying response, or None to stop and use it as-is"""
+        if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_ATTEMPTS - 1:
+            return None
+        delay = retry_delay(response, attempt)
+        if delay is None:
+            logger.warning(f"IT Glue asked to retry after {response.headers.get('Retry-After')}s; giving up")
+        return delay
+
+    def _request_error(self, error: Exception) -> Dict:
+        logger.error(f"IT Glue API error: {str(error)}")
+        return {'success': False, 'error': str(error)}
+
+    @staticmethod
+    def _first_page_params(params: Dict, page_size: int) -> Dict:
+        return dict(params or {}, **{'page[size]': page_size, 'page[number]': 1})
+
+    @staticmethod
+    def _remaining_page_params(first_page: Dict, params: Dict) -> List[Dict]:
+        """Params for pages 2..N, using the page count reported on page 1"""
+        total_pages = (first_page.get('meta') or {}).get('total-pages') or 1
+        return [dict(params, **{'page[number]': page}) for page in range(2, total_pages + 1)]
+
+    @staticmethod
+    def _merge_pages(first_page: Dict, page_results) -> Dict:
+        """Concatenate page data in API order, or return the first failed page result"""
+        data = list(first_page['data'])
+        for page_result in page_results:
+            if not page_result or 'data' not in page_result:
+                return page_result
+            data.extend(page_result['data'])
+
+        return {'data': data}
+
+    def _build_profile(self, org_id: int, org_result: Dict, config_result: Dict) -> Optional[Dict]:
+        """Build a policy profile from the organization and configurations API results"""
+        if not org_result or 'data' not in org_result:
+            logger.error(f"Failed to get organization {org_id}")
+            return None
 
-            # Get configurations for this organization
-            config_result = self._make_request('GET', '/configurations', params={
-                'filter[organization_id]': org_id,
-                'page[size]': 500
-            })
+        org_data = org_result.get('data', {})
+        attributes = org_data.get('attributes', {})
 
-            configurations = config_result.get('data', []) if config_result and 'data' in config_result else []
+        configurations = config_result.get('data', []) if config_result and 'data' in config_result else []
 
-            # Build profile
-            profile = {
-                'organization': {
-                    'id': org_data.get('id'),
-                    'name': attributes.get('name', ''),
-                    'organization_type': attributes.get('organization-type-name', ''),
-                    'status': attributes.get('organization-status-name', ''),
-                },
-                'total_configurations': len(configurations),
-                'technology_stack': self._parse_configurations(configurations),
-                'compliance_frameworks': self._detect_compliance_frameworks(configurations)
-            }
+        # Lowercase names and notes once and share them across the detectors
+        lower_names = []
+        lower_notes = []
+        for config in configurations:
+            config_attributes = config.get('attributes', {})
+            lower_names.append(config_attributes.get('name', '').lower())
+            lower_notes.append((config_attributes.get('notes') or '').lower())
+
+        # Build profile
+        profile = {
+            'organization': {
+                'id': org_data.get('id'),
+                'name': attributes.get('name', ''),
+                'organization_type': attributes.get('organization-type-name', ''),
+                'status': attributes.get('organization-status-name', ''),
+            },
+            'total_configurations': len(configurations),
+            'technology_stack': self._parse_configurations(configurations),
+            'compliance_frameworks': self._detect_compliance_frameworks(lower_names, lower_notes)
+        }
 
-            logger.info(f"Retrieved profile for organization {org_id} with {len(configurations)} configurations")
+        if not config_result or 'data' not in config_result:
+            # Return what we have, but don't cache a profile missing its configurations
+            error = config_result.get('error', 'Unknown error') if config_result else 'Unknown error'
+            logger.warning(f"Failed to get configurations for organization {org_id}: {error}; profile is incomplete")
             return profile
 
-        except Exception as e:
-            logger.error(f"Error getting organization profile: {str(e)}")
-            return None
+        logger.info(f"Retrieved profile for organization {org_id} with {len(configurations)} configurations")
+        self._cache_set(self._profile_cache, ('profile', org_id), profile)
+        # Kept out of the profile itself, which is returned to the browser as-is
+        self._cache_set(self._keyword_cache, profile['organization']['id'], self._find_tech_keywords(lower_names))
+        return profile
 
     def _parse_configurations(self, configurations: List[Dict]) -> Dict:
         """Parse configurations into categorized tech stack"""
@@ -145,45 +447,33 @@ class ITGlueIntegration:
             }
 
             # Categorize based on type
-            config_type = config_item['type'].lower()
-            if 'server' in config_type or 'workstation' in config_type or 'laptop' in config_type:
-                tech_stack['endpoints'].append(config_item)
-            elif 'firewall' in config_type or 'switch' in config_type or 'router' in config_type:
-                tech_stack['network'].append(config_item)
-            elif 'security' in config_type or 'antivirus' in config_type:
-                tech_stack['security'].append(config_item)
-            elif 'cloud' in config_type or 'saas' in config_type:
-                tech_stack['cloud'].append(config_item)
-            else:
-                tech_stack['other'].append(config_item)
+            tech_stack[config_type_bucket(config_item['type'])].append(config_item)
 
         return tech_stack
 
-    def _detect_compliance_frameworks(self, configurations: List[Dict]) -> List[str]:
-        """Detect compliance frameworks from configurations"""
+    def _detect_compliance_frameworks(self, lower_names: List[str], lower_notes: List[str]) -> List[str]:
+        """Detect compliance frameworks from lowercased configuration names and notes"""
         frameworks = set()
 
-        for config in configurations:
-            attributes = config.get('attributes', {})
-            name = attributes.get('name', '').lower()
-            notes = attributes.get('notes', '').lower() if attributes.get('notes') else ''
-
-            combined_text = f"{name} {notes}"
-
-            if 'hipaa' in combined_text:
-                frameworks.add('HIPAA')
-            if 'pci' in combined_text:
-                frameworks.add('PCI-DSS')
-            if 'nist' in combined_text:
-                frameworks.add('NIST')
-            if 'soc 2' in combined_text or 'soc2' in combined_text:
-                frameworks.add('SOC 2')
-            if 'iso 27001' in combined_text or 'iso27001' in combined_text:
-                frameworks.add('ISO 27001')
-            if 'gdpr' in combined_text:
-                frameworks.add('GDPR')
-            if 'cmmc' in combined_text:
-                frameworks.add('CMMC')
+        # One scan over every configuration's name and notes; the newline
+        # separator keeps keywords from matching across configurations
+        combined_text = '\n'.join(f"{name} {notes}" for name, notes in zip(lower_names, lower_notes))
+        hits = find_keywords(COMPLIANCE_AUTOMATON, combined_text)
+
+        if 'hipaa' in hits:
+            frameworks.add('HIPAA')
+        if 'pci' in hits:
+            frameworks.add('PCI-DSS')
+        if 'nist' in hits:
+            frameworks.add('NIST')
+        if hits & {'soc 2', 'soc2'}:
+            frameworks.add('SOC 2')
+        if hits & {'iso 27001', 'iso27001'}:
+            frameworks.add('ISO 27001')
+        if 'gdpr' in hits:
+            frameworks.add('GDPR')
+        if 'cmmc' in hits:
+            frameworks.add('CMMC')
 
         return list(frameworks)
 
@@ -208,46 +498,28 @@ class ITGlueIntegration:
         }
 
         # Map technology stack to specific form fields
-        tech_mapping = self._map_technology_stack(tech_stack)
+        detected_keywords = self._cache_get(self._keyword_cache, org_info.get('id'))
+        tech_mapping = self._map_technology_stack(tech_stack, detected_keywords)
         form_data.update(tech_mapping)
 
         return form_data
 
-    def _map_industry(self, org_type: str) -> str:
+    # The mappers below are pure and see the same few inputs across profiles,
+    # so their results are memoized
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _map_industry(org_type: str) -> str:
         """Map IT Glue organization type to industry dropdown"""
-        org_type_lower = org_type.lower()
-
-        industry_mapping = {
-            'healthcare': 'Healthcare',
-            'medical': 'Healthcare',
-            'hospital': 'Healthcare',
-            'clinic': 'Healthcare',
-            'financial': 'Financial Services',
-            'bank': 'Financial Services',
-            'investment': 'Financial Services',
-            'manufacturing': 'Manufacturing',
-            'factory': 'Manufacturing',
-            'retail': 'Retail',
-            'store': 'Retail',
-            'shop': 'Retail',
-            'technology': 'Technology',
-            'software': 'Technology',
-            'saas': 'Technology',
-            'education': 'Education',
-            'school': 'Education',
-            'university': 'Education',
-            'legal': 'Legal',
-            'law': 'Legal',
-            'attorney': 'Legal'
-        }
-
-        for keyword, industry in industry_mapping.items():
-            if keyword in org_type_lower:
-                return industry
+        # Earliest keyword in INDUSTRY_KEYWORDS order wins, as with the old dict walk
+        priorities = [priority for _, priority in INDUSTRY_AUTOMATON.iter(org_type.lower())]
+        if priorities:
+            return INDUSTRY_KEYWORDS[min(priorities)][1]
 
         return 'Other'
 
-    def _estimate_company_size(self, config_count: int) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _estimate_company_size(config_count: int) -> str:
         """Estimate company size based on number of configurations"""
         if config_count < 20:
             return 'Small (1-50 employees)'
@@ -258,146 +530,56 @@ class ITGlueIntegration:
         else:
             return 'Enterprise (1000+ employees)'
 
-    def _map_compliance(self, frameworks: List[str]) -> str:
+    @staticmethod
+    def _map_compliance(frameworks: List[str]) -> str:
         """Map detected compliance frameworks to form dropdown"""
+        return BaseITGlueIntegration._map_compliance_set(frozenset(frameworks or ()))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _map_compliance_set(frameworks: frozenset) -> str:
+        """Cached body of _map_compliance, keyed on the unordered set of frameworks"""
         if not frameworks:
             return ''
 
-        # Return the first detected framework that matches form options
-        framework_mapping = {
-            'NIST': 'NIST Cybersecurity Framework',
-            'SOC 2': 'SOC 2 Type II',
-            'ISO 27001': 'ISO 27001',
-            'HIPAA': 'HIPAA',
-            'PCI-DSS': 'PCI DSS',
-            'PCI': 'PCI DSS',
-            'GDPR': 'GDPR',
-            'CMMC': 'CMMC Level 2'
-        }
-
-        for framework in frameworks:
-            if framework in framework_mapping:
-                return framework_mapping[framework]
+        # Return the highest-priority detected framework that matches form options
+        return next(
+            (COMPLIANCE_FORM_OPTIONS[framework] for framework in COMPLIANCE_PRIORITY if framework in frameworks),
+            min(frameworks)
+        )
 
-        return frameworks[0] if frameworks else ''
+    def _find_tech_keywords(self, lower_names: List[str]) -> Set[str]:
+        """Technology keywords present in any configuration name"""
+        # Newline-joined so a keyword cannot span two configuration names
+        return find_keywords(TECH_STACK_AUTOMATON, '\n'.join(lower_names))
 
-    def _map_technology_stack(self, tech_stack: Dict) -> Dict:
+    def _map_technology_stack(self, tech_stack: Dict, detected_keywords: Set[str] = None) -> Dict:
         """
         Map IT Glue technology stack to policy generator form fields
         This is the KEY function that auto-detects all security tools
+        Uses detected_keywords from the profile build when given instead of rescanning names
         """
         tech_fields = {}
 
-        # Combine all configurations for analysis
-        all_configs = []
-        for category in tech_stack.values():
-            if isinstance(category, list):
-                all_configs.extend(category)
-
-        # Convert to lowercase names for matching
-        config_names = [config.get('name', '').lower() for config in all_configs]
-        config_text = ' '.join(config_names)
-
-        # Platform Choice Detection
-        if 'microsoft 365' in config_text or 'office 365' in config_text or 'azure' in config_text or 'o365' in config_text:
-            tech_fields['platform_choice'] = 'Microsoft 365 / Azure'
-        elif 'google workspace' in config_text or 'gmail' in config_text or 'gsuite' in config_text:
-            tech_fields['platform_choice'] = 'Google Workspace'
-        else:
-            tech_fields['platform_choice'] = 'Microsoft 365 / Azure'  # Default
-
-        # MDR/Endpoint Protection Detection
-        if 'sophos' in config_text:
-            tech_fields['mdr_solution'] = 'Sophos MDR'
-        elif 'crowdstrike' in config_text or 'sentinel' in config_text:
-            tech_fields['mdr_solution'] = 'Other MDR'
-        elif 'antivirus' in config_text or 'defender' in config_text:
-            tech_fields['mdr_solution'] = 'Traditional Antivirus Only'
+        if detected_keywords is not None:
+            hits = detected_keywords
         else:
-            tech_fields['mdr_solution'] = 'Sophos MDR'  # Crimson IT default
-
-        # Email Security Detection
-        if 'avanan' in config_text:
-            tech_fields['email_security'] = 'Avanan Email Security'
-        elif 'defender' in config_text or 'atp' in config_text:
-            tech_fields['email_security'] = 'Microsoft Defender'
-        elif 'proofpoint' in config_text or 'mimecast' in config_text:
-            tech_fields['email_security'] = 'Other Email Security'
-
-        # SIEM Detection
-        if 'siem' in config_text or 'splunk' in config_text or 'sentinel' in config_text:
-            tech_fields['siem_solution'] = 'SIEM with SOC monitoring'
-        elif 'log' in config_text and 'monitor' in config_text:
-            tech_fields['siem_solution'] = 'Basic log collection'
-
-        # PAM Detection
-        if 'senhasegura' in config_text:
-            tech_fields['pam_solution'] = 'Senhasegura PAM'
-        elif 'cyberark' in config_text or 'thycotic' in config_text or 'beyondtrust' in config_text:
-            tech_fields['pam_solution'] = 'Other PAM'
-
-        # Disk Encryption Detection
-        if 'bitlocker' in config_text:
-            if 'filevault' in config_text:
-                tech_fields['disk_encryption'] = 'Both BitLocker and FileVault'
+            # Combine all configurations for analysis
+            config_names = [
+                config.get('name', '').lower()
+                for category in tech_stack.values() if isinstance(category, list)
+                for config in category
+            ]
+            hits = self._find_tech_keywords(config_names)
+
+        for field, cases, default in TECH_STACK_RULES:
+            for condition, value in cases:
+                if all(hits & keywords for keywords in condition):
+                    tech_fields[field] = value
+                    break
             else:
-                tech_fields['disk_encryption'] = 'BitLocker (Windows)'
-        elif 'filevault' in config_text:
-            tech_fields['disk_encryption'] = 'FileVault (macOS)'
-
-        # MDM Detection
-        if 'intune' in config_text:
-            tech_fields['mdm_computers'] = 'Microsoft Intune'
-            tech_fields['mdm_mobile'] = 'Microsoft Intune'
-        elif 'jamf' in config_text or 'airwatch' in config_text:
-            tech_fields['mdm_computers'] = 'Other MDM'
-            tech_fields['mdm_mobile'] = 'Other MDM'
-
-        # Security Training Detection
-        if 'knowbe4' in config_text:
-            if 'monthly' in config_text:
-                tech_fields['security_training'] = 'KnowBe4 Monthly Training'
-            else:
-                tech_fields['security_training'] = 'KnowBe4 Quarterly Training'
-
-        # Phishing Tests Detection
-        if 'knowbe4' in config_text or 'phishing' in config_text:
-            tech_fields['phishing_tests'] = 'Monthly Phishing Tests'
-
-        # Vulnerability Scanning Detection
-        if 'vulnerability' in config_text or 'nessus' in config_text or 'qualys' in config_text:
-            if 'monthly' in config_text:
-                tech_fields['vulnerability_scans'] = 'Monthly Vulnerability Scans'
-            else:
-                tech_fields['vulnerability_scans'] = 'Quarterly Vulnerability Scans'
-
-        # Dark Web Monitoring Detection
-        if 'darkwebid' in config_text or 'dark web' in config_text:
-            tech_fields['dark_web_monitoring'] = 'DarkWebID Monitoring'
-        elif 'breach' in config_text and 'monitor' in config_text:
-            tech_fields['dark_web_monitoring'] = 'Other Dark Web Monitoring'
-
-        # MFA Detection
-        if 'microsoft' in config_text and ('mfa' in config_text or 'authenticator' in config_text):
-            tech_fields['mfa_solution'] = 'Microsoft MFA'
-        elif 'duo' in config_text:
-            tech_fields['mfa_solution'] = 'Duo Security'
-        elif 'mfa' in config_text or 'two-factor' in config_text or '2fa' in config_text:
-            tech_fields['mfa_solution'] = 'Other MFA'
-
-        # Password Manager Detection
-        if 'lastpass' in config_text:
-            tech_fields['password_manager'] = 'LastPass Business'
-        elif '1password' in config_text or 'dashlane' in config_text or 'keeper' in config_text:
-            tech_fields['password_manager'] = 'Other Password Manager'
-
-        # Intrusion Detection Detection
-        if 'ids' in config_text or 'ips' in config_text or 'intrusion' in config_text:
-            tech_fields['intrusion_detection'] = 'Network Intrusion Detection System'
-        elif 'firewall' in config_text and ('sonicwall' in config_text or 'fortinet' in config_text or 'palo alto' in config_text):
-            tech_fields['intrusion_detection'] = 'Firewall with IDS/IPS'
-        elif 'firewall' in config_text or 'meraki' in config_text:
-            tech_fields['intrusion_detection'] = 'Basic Firewall'
+                if default:
+                    tech_fields[field] = default
 
         return tech_fields
 
@@ -423,3 +605,264 @@ class ITGlueIntegration:
         except Exception as e:
             logger.error(f"Error saving policy to IT Glue: {str(e)}")
             return {'success': False, 'error': str(e)}
+
+
+class ITGlueIntegration(BaseITGlueIntegration):
+    """Direct interface to IT Glue API"""
+
+    def __init__(self):
+        super().__init__()
+
+        # One HTTP/2 connection pool multiplexes all API calls, including the
+        # concurrent page and profile fetches
+        # (transport retries cover connection failures only)
+        self.client = httpx.Client(
+            headers=self.headers,
+            timeout=self.timeout,
+            transport=httpx.HTTPTransport(
+                http2=True,
+                retries=3,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10)
+            )
+        )
+
+        # Independent API calls are issued concurrently on this pool
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        # Bulk profile loads run on their own pool, since each profile
+        # waits on page requests queued to the pool above
+        self._bulk_executor = ThreadPoolExecutor(max_workers=8)
+
+        # Requests from every pool share one in-flight cap
+        self._inflight = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+
+    def close(self):
+        """Close pooled connections and worker threads"""
+        self._executor.shutdown(wait=False)
+        self._bulk_executor.shutdown(wait=False)
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _make_request(self, method: str, endpoint: str, params: Dict = None) -> Dict:
+        """Make request to IT Glue API"""
+        if not self.api_key:
+            return {'success': False, 'error': 'IT Glue API key not configured'}
+
+        url, etag_key, headers = self._prepare_request(method, endpoint, params)
+
+        try:
+            for attempt in range(MAX_ATTEMPTS):
+                time.sleep(self._rate_limiter.reserve())
+                with self._inflight:
+                    response = self.client.request(method.upper(), url, params=params, headers=headers)
+                delay = self._next_retry_delay(response, attempt)
+                if delay is None:
+                    break
+                time.sleep(delay)
+
+            return self._read_response(response, etag_key)
+        except (httpx.HTTPError, ValueError) as e:
+            return self._request_error(e)
+
+    def _paginate(self, endpoint: str, params: Dict = None, page_size: int = 200) -> Dict:
+        """
+        Fetch every page of a list endpoint
+        Page 1 reports the page count; remaining pages are fetched concurrently
+        """
+        params = self._first_page_params(params, page_size)
+        first_page = self._make_request('GET', endpoint, params=params)
+
+        if not first_page or 'data' not in first_page:
+            return first_page
+
+        futures = [
+            self._executor.submit(self._make_request, 'GET', endpoint, page_params)
+            for page_params in self._remaining_page_params(first_page, params)
+        ]
+
+        # Keep API ordering by collecting pages in order
+        return self._merge_pages(first_page, (future.result() for future in futures))
+
+    def get_active_organizations(self) -> List[Dict]:
+        """Get list of active client organizations for dropdown"""
+        cached = self._cache_get(self._cache, ('orgs',))
+        if cached is not None:
+            return cached
+
+        try:
+            # Get organizations with active status (filtered server-side)
+            result = self._paginate('/organizations', {
+                'filter[organization_status_name]': 'Active',
+                'sort': 'name',
+                **ORGANIZATION_FIELDS
+            })
+
+            if not result or 'data' not in result:
+                logger.error(f"Failed to get organizations: {result.get('error', 'Unknown error')}")
+                return []
+
+            # Parse IT Glue response format
+            organizations = []
+            for org in result.get('data', []):
+                attributes = org.get('attributes', {})
+                organizations.append({
+                    'id': org.get('id'),
+                    'name': attributes.get('name', ''),
+                    'type': attributes.get('organization-type-name', ''),
+                    'status': attributes.get('organization-status-name', '')
+                })
+
+            logger.info(f"Retrieved {len(organizations)} active organizations from IT Glue")
+            self._cache_set(self._cache, ('orgs',), organizations)
+            return organizations
+
+        except Exception as e:
+            logger.error(f"Error getting organizations: {str(e)}")
+            return []
+
+    def get_organization_profile(self, org_id: int, org_result: Dict = None) -> Optional[Dict]:
+        """
+        Get comprehensive organization profile for policy generation
+        Pass org_result when the organization record is already known to skip its lookup
+        """
+        cached = self._cache_get(self._profile_cache, ('profile', org_id))
+        if cached is not None:
+            return cached
+
+        try:
+            # Get organization details while paging through its configurations
+            # (pagination submits its own page requests to the executor)
+            org_future = None
+            if org_result is None:
+                org_future = self._executor.submit(self._make_request, 'GET', f'/organizations/{org_id}', ORGANIZATION_FIELDS)
+            config_result = self._paginate('/configurations', {'filter[organization_id]': org_id, **CONFIGURATION_FIELDS})
+            if org_future is not None:
+                org_result = org_future.result()
+
+            return self._build_profile(org_id, org_result, config_result)
+
+        except Exception as e:
+            logger.error(f"Error getting organization profile: {str(e)}")
+            return None
+
+    def get_profiles_bulk(self, org_ids: List[int]) -> Dict[int, Optional[Dict]]:
+        """Get profiles for several organizations at once, e.g. to prefetch likely picks"""
+        # The (cached) active organization list stands in for per-organization lookups
+        organizations = {str(org['id']): org for org in self.get_active_organizations()}
+
+        futures = {}
+        for org_id in org_ids:
+            org = organizations.get(str(org_id))
+            org_result = None
+            if org:
+                org_result = {'data': {'id': org['id'], 'attributes': {
+                    'name': org['name'],
+                    'organization-type-name': org['type'],
+                    'organization-status-name': org['status']
+                }}}
+            futures[org_id] = self._bulk_executor.submit(self.get_organization_profile, org_id, org_result)
+
+        return {org_id: future.result() for org_id, future in futures.items()}
+
+@functools.lru_cache(maxsize=1)
+def get_itglue() -> ITGlueIntegration:
+    """Process-wide client, so the connection pool and caches outlive each web request"""
+    return ITGlueIntegration()
+
+
+class AsyncITGlueIntegration(BaseITGlueIntegration):
+    """
+    Asyncio interface for loading many organization profiles concurrently
+    Shares credentials, caches, parsing and mapping with ITGlueIntegration
+    """
+
+    def __init__(self, max_concurrent_profiles: int = 10):
+        super().__init__()
+        self.async_client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=self.timeout,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=3,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=20)
+            )
+        )
+        self.max_concurrent_profiles = max_concurrent_profiles
+        # Tasks cap their in-flight requests without blocking the event loop
+        self._async_inflight = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+    async def aclose(self):
+        """Close the async connection pool"""
+        await self.async_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+    async def _make_request_async(self, method: str, endpoint: str, params: Dict = None) -> Dict:
+        """Make request to IT Glue API without blocking the event loop"""
+        if not self.api_key:
+            return {'success': False, 'error': 'IT Glue API key not configured'}
+
+        url, etag_key, headers = self._prepare_request(method, endpoint, params)
+
+        try:
+            for attempt in range(MAX_ATTEMPTS):
+                await asyncio.sleep(self._rate_limiter.reserve())
+                async with self._async_inflight:
+                    response = await self.async_client.request(method.upper(), url, params=params, headers=headers)
+                delay = self._next_retry_delay(response, attempt)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+
+            return self._read_response(response, etag_key)
+        except (httpx.HTTPError, ValueError) as e:
+            return self._request_error(e)
+
+    async def _paginate_async(self, endpoint: str, params: Dict = None, page_size: int = 200) -> Dict:
+        """Fetch every page of a list endpoint, pages 2..N concurrently"""
+        params = self._first_page_params(params, page_size)
+        first_page = await self._make_request_async('GET', endpoint, params=params)
+
+        if not first_page or 'data' not in first_page:
+            return first_page
+
+        page_results = await asyncio.gather(*(
+            self._make_request_async('GET', endpoint, page_params)
+            for page_params in self._remaining_page_params(first_page, params)
+        ))
+        return self._merge_pages(first_page, page_results)
+
+    async def get_organization_profile_async(self, org_id: int) -> Optional[Dict]:
+        """Get comprehensive organization profile for policy generation"""
+        cached = self._cache_get(self._profile_cache, ('profile', org_id))
+        if cached is not None:
+            return cached
+
+        try:
+            org_result, config_result = await asyncio.gather(
+                self._make_request_async('GET', f'/organizations/{org_id}', ORGANIZATION_FIELDS),
+                self._paginate_async('/configurations', {'filter[organization_id]': org_id, **CONFIGURATION_FIELDS})
+            )
+            return self._build_profile(org_id, org_result, config_result)
+
+        except Exception as e:
+            logger.error(f"Error getting organization profile: {str(e)}")
+            return None
+
+    async def get_profiles_async(self, org_ids: List[int]) -> List[Optional[Dict]]:
+        """Get profiles for many organizations, at most max_concurrent_profiles at a time"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_profiles)
+
+        async def get_profile(org_id):
+            async with semaphore:
+                return await self.get_organization_profile_async(org_id)
+
+        return await asyncio.gather(*(get_profile(org_id) for org_id in org_ids))
@@ -0,0 +1,152 @@
+"""
+Word document builder for generated policies
+Imports only python-docx so DOCX_POOL worker processes start quickly
+"""
+
+import io
+import re
+from datetime import datetime
+from xml.sax.saxutils import escape
+from docx import Document
+from docx.shared import Inches
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+# Classifies a policy line by its leading markdown marker; numbered items
+# need a ". " or ") " within the first five characters
+LINE_KIND_RE = re.compile(r'(?P<h2>##)|(?P<h1>#)|(?P<bullet>-|•|\* )|(?P<number>[1-9].{0,2}[.)] )')
+
+def build_document_template():
+    """Build the fixed margins and header once and serialize them for reuse"""
+    doc = Document()
+    
+    # Set document margins
+    sections = doc.sections
+    for section in sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1.25)
+        section.right_margin = Inches(1.25)
+    
+    # Add header with Crimson IT branding
+    header_para = doc.add_paragraph()
+    header_run = header_para.add_run('CRIMSON IT')
+    header_run.bold = True
+    header_para.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+DOCUMENT_TEMPLATE = build_document_template()
+
+def append_paragraphs(doc, paragraphs):
+    """Append (style name, lines) paragraphs to the document body in one parse"""
+    style_ids = {}
+    xml_paragraphs = []
+    for style, lines in paragraphs:
+        properties = ''
+        if style:
+            if style not in style_ids:
+                style_ids[style] = doc.styles[style].style_id
+            properties = f'<w:pPr><w:pStyle w:val="{style_ids[style]}"/></w:pPr>'
+        run = f'<w:r><w:t xml:space="preserve">{escape(" ".join(lines))}</w:t></w:r>' if lines else ''
+        xml_paragraphs.append(f'<w:p>{properties}{run}</w:p>')
+    
+    parsed = parse_xml(f'<w:body {nsdecls("w")}>{"".join(xml_paragraphs)}</w:body>')
+    
+    # Paragraphs must stay ahead of the body's trailing section properties
+    body = doc.element.body
+    anchor = body.sectPr
+    for paragraph in list(parsed):
+        if anchor is not None:
+            anchor.addprevious(paragraph)
+        else:
+            body.append(paragraph)
+
+def create_word_document(form_data, policy_lines):
+    """Create a professional Word document"""
+    try:
+        # Start from the preformatted template (margins and header)
+        doc = Document(io.BytesIO(DOCUMENT_TEMPLATE))
+        
+        # Add main title
+        title_para = doc.add_paragraph()
+        title_run = title_para.add_run(form_data['client_name'].upper())
+        title_run.bold = True
+        title_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Add subtitle
+        subtitle_para = doc.add_paragraph()
+        subtitle_run = subtitle_para.add_run(form_data['policy_type'])
+        subtitle_run.bold = True
+        subtitle_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Add generation info
+        info_para = doc.add_paragraph()
+        info_para.add_run(f'Document Generated: {datetime.now().strftime("%B %d, %Y")}').italic = True
+        info_para.add_run('\nManaged by: Crimson IT (MSP/MSSP)').italic = True
+        info_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        # Add separator
+        doc.add_paragraph('_' * 60).alignment = WD_ALIGN_PARAGRAPH.CENTER
+        doc.add_paragraph()
+        
+        # Collect policy content as (style, lines) pairs, then add it to the
+        # document body in a single XML parse
+        paragraphs = []
+        current_paragraph = None
+        
+        for line in policy_lines:
+            line = line.strip()
+            if not line:
+                if current_paragraph:
+                    paragraphs.append((None, []))
+                current_paragraph = None
+                continue
+                
+            match = LINE_KIND_RE.match(line)
+            kind = match.lastgroup if match else None
+            
+            if kind == 'h2':
+                paragraphs.append(('Heading 2', [line.replace('##', '').strip()]))
+                current_paragraph = None
+            elif kind == 'h1':
+                paragraphs.append(('Heading 1', [line.replace('#', '').strip()]))
+                current_paragraph = None
+            elif line.endswith(':') or (len(line) > 10 and line.isupper()):
+                paragraphs.append(('Heading 2', [line.rstrip(':')]))
+                current_paragraph = None
+            elif kind == 'bullet':
+                bullet_text = line[1:].strip() if match.group('bullet') == '-' else line[2:].strip()
+                paragraphs.append(('List Bullet', [bullet_text]))
+                current_paragraph = None
+            elif kind == 'number':
+                paragraphs.append(('List Number', [line]))
+                current_paragraph = None
+            else:
+                if current_paragraph is None:
+                    current_paragraph = []
+                    paragraphs.append((None, current_paragraph))
+                current_paragraph.append(line)
+        
+        append_paragraphs(doc, paragraphs)
+        
+        # Add footer
+        doc.add_paragraph()
+        footer_para = doc.add_paragraph()
+        footer_para.add_run('This document was generated by Crimson IT\'s AI-powered policy generator.').italic = True
+        footer_para.add_run('\nFor questions or updates, contact your Crimson IT representative.').italic = True
+        footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        
+        return doc
+        
+    except Exception as e:
+        raise Exception(f"Error creating Word document: {str(e)}")
+
+def build_docx_bytes(form_data, policy_lines):
+    """Build the Word document and return it serialized, for use in DOCX_POOL"""
+    buffer = io.BytesIO()
+    create_word_document(form_data, policy_lines).save(buffer)
+    return buffer.getvalue()
@@ -22,4 +22,6 @@ def health():
 if __name__ == '__main__':
     import os
     port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    # Multi-threaded WSGI server so concurrent requests aren't serialized
+    from waitress import serve
+    serve(app, host='0.0.0.0', port=port, threads=8)
\ No newline at end of file